@@ -14,9 +14,16 @@ This模块包含三类智能体：
 
 from mesa.discrete_space import CellAgent, FixedAgent
 
+# 智能体类别标签：邻居筛选中用整数比较代替 isinstance 的类型层次检查
+KIND_SHEEP = 1
+KIND_WOLF = 2
+KIND_GRASS = 3
+
 class Animal(CellAgent):
     """动物基类，封装通用的能量与生命周期逻辑。"""
 
+    counter = None  # 模型上对应的种群计数器属性名，由子类指定
+
     def __init__(
         self, model, energy=8, p_reproduce=0.04, energy_from_food=4, cell=None
     ):
@@ -34,6 +41,12 @@ class Animal(CellAgent):
         self.p_reproduce = p_reproduce  # 繁殖概率（无性繁殖）
         self.energy_from_food = energy_from_food  # 每次进食获得的能量
         self.cell = cell  # 动物所处的网格 Cell 对象
+        setattr(model, self.counter, getattr(model, self.counter) + 1)
+
+    def remove(self):
+        """移除动物，并同步递减模型上的种群计数器。"""
+        super().remove()
+        setattr(self.model, self.counter, getattr(self.model, self.counter) - 1)
 
     def spawn_offspring(self):
         """创建一个与当前类型相同的后代，并按能量守恒分摊。"""
@@ -69,11 +82,12 @@ class Animal(CellAgent):
 class Sheep(Animal):
     """羊：会避开狼、优先寻草的草食动物。"""
 
+    kind = KIND_SHEEP
+    counter = "n_sheep"
+
     def feed(self):
         """若所在格子存在可食用草地，则摄入能量并触发草地再生倒计时。"""
-        grass_patch = next(  # 获取同一 cell 中的草地对象
-            obj for obj in self.cell.agents if isinstance(obj, GrassPatch)
-        )
+        grass_patch = self.cell.grass  # 草地在创建时绑定到所在 cell，无需扫描 cell.agents
         if grass_patch.fully_grown:  # 草地成熟即可食用
             self.energy += self.energy_from_food
             grass_patch.fully_grown = False
@@ -81,15 +95,13 @@ class Sheep(Animal):
     def move(self):
         """优先移动至安全且有成熟草地的格子。"""
         cells_without_wolves = self.cell.neighborhood.select( # 自动获取周围 cell 的列表
-            lambda cell: not any(isinstance(obj, Wolf) for obj in cell.agents) # 查看是否周围 cell 中有 Wolf 对象
+            lambda cell: not any(obj.kind == KIND_WOLF for obj in cell.agents) # 查看是否周围 cell 中有 Wolf 对象
         )
         if len(cells_without_wolves) == 0:
             return  # 周围全是狼则原地不动，避免送死
 
         cells_with_grass = cells_without_wolves.select( # 自动获取周围 cell 的列表
-            lambda cell: any(
-                isinstance(obj, GrassPatch) and obj.fully_grown for obj in cell.agents
-            )
+            lambda cell: cell.grass.fully_grown # 直接读取 cell 上绑定的草地是否成熟
         )
         target_cells = (
             cells_with_grass if len(cells_with_grass) > 0 else cells_without_wolves
@@ -100,9 +112,12 @@ class Sheep(Animal):
 class Wolf(Animal):
     """狼：会追逐羊的捕食者。"""
 
+    kind = KIND_WOLF
+    counter = "n_wolves"
+
     def feed(self):
         """若当前格子有羊，随机捕食一只并获得能量。"""
-        sheep = [obj for obj in self.cell.agents if isinstance(obj, Sheep)]
+        sheep = [obj for obj in self.cell.agents if obj.kind == KIND_SHEEP]
         if sheep:
             sheep_to_eat = self.random.choice(sheep)
             self.energy += self.energy_from_food
@@ -111,7 +126,7 @@ class Wolf(Animal):
     def move(self):
         """优先向有羊的邻居格子移动，以提高捕食概率。"""
         cells_with_sheep = self.cell.neighborhood.select(
-            lambda cell: any(isinstance(obj, Sheep) for obj in cell.agents)
+            lambda cell: any(obj.kind == KIND_SHEEP for obj in cell.agents)
         )
         target_cells = (
             cells_with_sheep if len(cells_with_sheep) > 0 else self.cell.neighborhood
@@ -122,6 +137,8 @@ class Wolf(Animal):
 class GrassPatch(FixedAgent):
     """草地：被羊啃食后按固定时间再生的固定型智能体。"""
 
+    kind = KIND_GRASS
+
     def __init__(self, model, countdown, grass_regrowth_time, cell):
         """创建草地智能体。
 
@@ -133,20 +150,27 @@ class GrassPatch(FixedAgent):
         """
         super().__init__(model)
         self.grass_regrowth_time = grass_regrowth_time
-        self.countdown = countdown
         self.cell = cell
-        self._fully_grown = countdown == 0
+        cell.grass = self  # 草地固定不动，绑定一次即可让羊按 cell 直接找到它
+        self.model.grass_countdown[cell.coordinate] = countdown
+        self.model.grass_grown[cell.coordinate] = countdown == 0
+        self.model.n_grass_grown += countdown == 0
+
+    @property
+    def countdown(self):
+        """距离成熟还需等待的步数（读取模型的倒计时数组）。"""
+        return self.model.grass_countdown[self.cell.coordinate]
 
     @property
     def fully_grown(self):
-        """草地是否成熟可食。"""
-        return self._fully_grown
+        """草地是否成熟可食（读取模型的成熟标记数组）。"""
+        return self.model.grass_grown[self.cell.coordinate]
 
     @fully_grown.setter # 设置草地状态：被吃掉时重置倒计时。
     def fully_grown(self, value: bool) -> None:
         """设置草地状态：被吃掉时重置倒计时。"""
-        self._fully_grown = value
+        if self.model.grass_grown[self.cell.coordinate] != value:  # 仅在状态切换时更新计数
+            self.model.n_grass_grown += 1 if value else -1
+        self.model.grass_grown[self.cell.coordinate] = value
         if not value:
-            self.countdown = self.grass_regrowth_time
-            
-            
+            self.model.grass_countdown[self.cell.coordinate] = self.grass_regrowth_time
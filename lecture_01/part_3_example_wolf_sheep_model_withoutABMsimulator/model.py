@@ -11,6 +11,7 @@
 
 import math
 
+import numpy as np
 from mesa import Model
 from mesa.datacollection import DataCollector
 from mesa.discrete_space import OrthogonalVonNeumannGrid
@@ -72,17 +73,34 @@ class WolfSheep(Model):
 
         # Set up data collection
         model_reporters = {
-            "Wolves": lambda m: len(m.agents_by_type[Wolf]), # m 就是self（模型实例），访问模型实例的agents_by_type属性，获取狼的数量
-            "Sheep": lambda m: len(m.agents_by_type[Sheep]), # m 就是self（模型实例），访问模型实例的agents_by_type属性，获取羊的数量
+            "Wolves": lambda m: m.n_wolves, # m 就是self（模型实例），直接读取狼的数量计数器
+            "Sheep": lambda m: m.n_sheep, # m 就是self（模型实例），直接读取羊的数量计数器
         }
         
         if grass:
-            model_reporters["Grass"] = lambda m: len( # m 就是self（模型实例），访问模型实例的agents_by_type属性，获取草地的数量
-                m.agents_by_type[GrassPatch].select(lambda a: a.fully_grown)
-            )
+            model_reporters["Grass"] = lambda m: m.n_grass_grown # 成熟草地计数器，在草地状态切换时维护
 
         self.datacollector = DataCollector(model_reporters)
 
+        # 草地状态以数组（SoA）形式保存在模型上，GrassPatch 只是按坐标读写这两个数组的视图
+        # 倒计时取值在 [0, grass_regrowth_time] 内：默认用 int16，再生时间超出 int16 范围时
+        # 提升为能容纳它的有符号整数类型
+        countdown_dtype = np.result_type(
+            np.min_scalar_type(grass_regrowth_time), np.int16
+        )
+        self.grass_countdown = np.zeros(
+            (self.height, self.width), dtype=countdown_dtype
+        )
+        self.grass_grown = np.ones((self.height, self.width), dtype=bool)
+        # 每步更新草地时复用的掩码缓冲区，避免反复分配临时数组
+        self._not_grown = np.empty_like(self.grass_grown)
+        self._newly_grown = np.empty_like(self.grass_grown)
+
+        # 种群计数器：由智能体在出生/死亡、草地在成熟/被吃时维护，数据收集无需遍历
+        self.n_sheep = 0
+        self.n_wolves = 0
+        self.n_grass_grown = 0
+
         # Create sheep:
         Sheep.create_agents( # 调用 Sheep 类的 create_agents 方法，创建羊
             self,
@@ -102,6 +120,11 @@ class WolfSheep(Model):
             cell=self.random.choices(self.grid.all_cells.cells, k=initial_wolves),
         )
 
+        # agents_by_type 中的 AgentSet 创建后会随出生/死亡原地更新，这里直接持有引用，
+        # 省去每个时间步的字典查找
+        self._sheep_set = self.agents_by_type[Sheep]
+        self._wolf_set = self.agents_by_type[Wolf]
+
         # Create grass patches if enabled
         if grass:
             possibly_fully_grown = [True, False]
@@ -123,19 +146,21 @@ class WolfSheep(Model):
     def step(self):
         """执行一个时间步的模型更新。"""
         # 1. 先让羊执行（随机顺序），确保被捕食前有机会移动/吃草
-        self.agents_by_type[Sheep].shuffle_do("step")
+        self._sheep_set.shuffle_do("step")
         # 2. 再执行狼，避免一个时间步内“狼瞬间移动后立刻被吃”之类的不合理情况
-        self.agents_by_type[Wolf].shuffle_do("step")
+        self._wolf_set.shuffle_do("step")
         
         # 3. 更新草地（这里没有使用ABMsimulator）
-        if self.grass:  # 如果启用了草地生长            
-            for grass_patch in self.agents_by_type[GrassPatch]: # 遍历所有草地
-                if not grass_patch.fully_grown: # 会首先判断草地是否成熟，如果没成熟，则倒计时减1
-                    grass_patch.countdown -= 1 # 倒计时减1，如果倒计时小于等于0，则草地成熟
-                    if grass_patch.countdown <= 0: # 如果倒计时小于等于0
-                        grass_patch.fully_grown = True # 草地成熟
-                else: # 如果草地成熟，则不进行任何操作
-                    pass
+        # 一次向量化运算代替对每块草地的逐个属性访问；全部使用 out= 原地运算，
+        # 不做花式索引的收集/散射，也不分配临时数组
+        if self.grass:
+            not_grown, newly = self._not_grown, self._newly_grown
+            np.logical_not(self.grass_grown, out=not_grown)
+            np.subtract(self.grass_countdown, 1, out=self.grass_countdown, where=not_grown)
+            np.less_equal(self.grass_countdown, 0, out=newly)
+            newly &= not_grown
+            self.grass_grown |= newly
+            self.n_grass_grown += int(np.count_nonzero(newly))
 
         # 4. 更新观测数据，便于绘制时间序列曲线
         self.datacollector.collect(self) # 收集当前的种群数量
@@ -0,0 +1,25 @@
+"""WolfSheep 草地倒计时数组的边界测试。"""
+
+import numpy as np
+import pytest
+from model import WolfSheep
+
+
+@pytest.mark.parametrize("grass_regrowth_time", [127, 128, 32767, 32768])
+def test_grass_countdown_holds_regrowth_time(grass_regrowth_time):
+    """倒计时数组的类型必须能容纳 grass_regrowth_time（int8/int16 的边界附近）。"""
+    model = WolfSheep(
+        width=5,
+        height=5,
+        initial_sheep=10,
+        initial_wolves=2,
+        grass_regrowth_time=grass_regrowth_time,
+        seed=42,
+    )
+    assert np.iinfo(model.grass_countdown.dtype).max >= grass_regrowth_time
+
+    # 被吃掉的草地会把倒计时重置为 grass_regrowth_time，随后每步递减
+    for _ in range(3):
+        model.step()
+    assert model.grass_countdown.max() <= grass_regrowth_time
+    assert model.grass_countdown.min() >= 0
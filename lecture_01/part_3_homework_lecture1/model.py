@@ -1,17 +1,20 @@
 """MoneyModel：演示随机财富交换的最小示例模型。"""
 
 import mesa
+import numpy as np
 from mesa.discrete_space import CellAgent, OrthogonalMooreGrid
 from agents import MoneyAgent
 
 def compute_gini(model):
     """按照洛伦兹曲线公式计算当前的 Gini 系数。"""
 
-    agent_wealths = [agent.wealth for agent in model.agents]
-    x = sorted(agent_wealths)
     N = model.num_agents
-    B = sum(xi * (N - i) for i, xi in enumerate(x)) / (N * sum(x))
-    return 1 + (1 / N) - 2 * B
+    # 财富一次性读入 NumPy 数组，排序与加权求和都在 C 层完成
+    x = np.sort(
+        np.fromiter((agent.wealth for agent in model.agents), dtype=np.int64, count=N)
+    )
+    B = (x * (N - np.arange(N))).sum() / (N * x.sum())
+    return float(1 + (1 / N) - 2 * B)
 
 class MoneyModel(mesa.Model):
     """声明并控制 MoneyAgent 的整体环境。"""
@@ -5,7 +5,7 @@
 
 本实现演示了：
 1.  **分布式空间**：使用 `SharedGrid` 处理分布在多个进程中的 Agent。
-2.  **Numba 优化**：使用 `@jitclass` 实现高性能的邻居查找。
+2.  **Numba 优化**：邻居计数、满意度判断与移动在 `@njit` 编译内核中完成。
 3.  **MPI 同步**：处理 Agent 在不同秩（Rank）之间的状态转移。
 4.  **数据记录**：使用 Repast4py 的日志基础设施。
 
@@ -13,13 +13,16 @@
 > uv run mpirun -n 8 python schelling.py params.yaml
 """
 
+import functools
+import itertools
+import os
 from argparse import Namespace
 from dataclasses import dataclass
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
 from mpi4py import MPI
-from numba import int32
+from numba import int32, njit
 from numba.experimental import jitclass
 from repast4py import context as ctx
 from repast4py import core, logging, parameters, random, schedule, space
@@ -36,84 +39,244 @@ spec = [
     ("ymin", int32),
     ("ymax", int32),
     ("xmax", int32),
+    ("radius", int32),
 ]
 
 
+# 邻域名称 -> (半径, 是否为 Von Neumann 邻域)；未列出的名称默认为 Moore 半径 1
+NEIGHBORHOOD_SHAPES = {
+    "4": (1, True),
+    "8": (1, False),
+    "12": (2, True),
+    "24": (2, False),
+    "48": (3, False),
+    "80": (4, False),
+}
+
+
+@functools.lru_cache(maxsize=None)
 def get_neighborhood_offsets(name: str) -> Tuple[np.ndarray, np.ndarray]:
     """
     为不同的邻域类型生成偏移量数组。
     支持的类型："4" (Von Neumann), "8" (Moore), "12" (Von Neumann r=2), "24" (Moore r=2), "48" (Moore r=3), "80" (Moore r=4)。
+
+    结果按名称缓存，返回的数组为只读，可在多个 `GridNghFinder` 之间共享。
     """
-    name = str(name)
-    if name == "4":
-        # Von Neumann (4 邻域)
-        mo = np.array([0, 0, 1, -1], dtype=np.int32)
-        no = np.array([1, -1, 0, 0], dtype=np.int32)
-    elif name == "12":
-        # 扩展 Von Neumann 半径 2 (12 邻域)
-        # 曼哈顿距离 <= 2
-        xs, ys = [], []
-        for x in range(-2, 3):
-            for y in range(-2, 3):
-                dist = abs(x) + abs(y)
-                if dist > 0 and dist <= 2:
-                    xs.append(x)
-                    ys.append(y)
-        mo = np.array(xs, dtype=np.int32)
-        no = np.array(ys, dtype=np.int32)
-    elif name == "24":
-        # Moore 半径 2 (24 邻域)
-        xs, ys = [], []
-        for x in range(-2, 3):
-            for y in range(-2, 3):
-                if x == 0 and y == 0:
-                    continue
-                xs.append(x)
-                ys.append(y)
-        mo = np.array(xs, dtype=np.int32)
-        no = np.array(ys, dtype=np.int32)
-    elif name == "48":
-        # Moore 半径 3 (48 邻域)
-        xs, ys = [], []
-        for x in range(-3, 4):
-            for y in range(-3, 4):
-                if x == 0 and y == 0:
-                    continue
-                xs.append(x)
-                ys.append(y)
-        mo = np.array(xs, dtype=np.int32)
-        no = np.array(ys, dtype=np.int32)
-    elif name == "80":
-        # Moore 半径 4 (80 邻域)
-        xs, ys = [], []
-        for x in range(-4, 5):
-            for y in range(-4, 5):
-                if x == 0 and y == 0:
-                    continue
-                xs.append(x)
-                ys.append(y)
-        mo = np.array(xs, dtype=np.int32)
-        no = np.array(ys, dtype=np.int32)
-    else:
-        # 默认为 Moore (8 邻域)
-        mo = np.array([-1, 0, 1, -1, 1, -1, 0, 1], dtype=np.int32)
-        no = np.array([1, 1, 1, 0, 0, -1, -1, -1], dtype=np.int32)
+    radius, von_neumann = NEIGHBORHOOD_SHAPES.get(str(name), (1, False))
 
+    # 在 (2r+1) x (2r+1) 的方格上一次性生成全部候选偏移，再用掩码筛选
+    gx, gy = np.mgrid[-radius : radius + 1, -radius : radius + 1]
+    if von_neumann:
+        # 曼哈顿距离 <= r
+        mask = np.abs(gx) + np.abs(gy) <= radius
+    else:
+        # 切比雪夫距离 <= r
+        mask = np.ones_like(gx, dtype=bool)
+    mask &= (gx != 0) | (gy != 0)  # 排除中心单元
+
+    mo = gx[mask].astype(np.int32)
+    no = gy[mask].astype(np.int32)
+    mo.setflags(write=False)
+    no.setflags(write=False)
     return mo, no
 
 
+def similarity_cutoffs(threshold: float, max_neighbors: int) -> np.ndarray:
+    """
+    把相似度阈值换算成按邻居总数索引的整数门槛表。
+
+    `cutoffs[total]` 是满足 `similar / total >= threshold` 的最小 similar（无解时为 total + 1），
+    `cutoffs[0]` 为 0（没有邻居时默认为满意）。表中每一项都用与原判断完全相同的浮点除法求得，
+    因此 `similar >= cutoffs[total]` 与原判断逐位等价，但每个 Agent 只需一次整数比较。
+
+    参数:
+        threshold (float): 感到满意所需的相似邻居的最小比例。
+        max_neighbors (int): 邻域大小（邻居总数的上限）。
+
+    返回:
+        np.ndarray: 长度为 max_neighbors + 1 的 int32 数组。
+    """
+    cutoffs = np.zeros(max_neighbors + 1, dtype=np.int32)
+    for total in range(1, max_neighbors + 1):
+        cutoffs[total] = next(
+            (s for s in range(total + 1) if s / total >= threshold), total + 1
+        )
+    return cutoffs
+
+
+# jitclass 无法落盘缓存，因此把热点循环放在模块级的 njit(cache=True) 函数中：
+# 编译结果写入 __pycache__，后续运行（以及同一检出目录下的所有 MPI 进程）直接加载，
+# 不必在每次启动时重新 JIT。
+@njit(cache=True)
+def _count_similar(type_grid, x, y, agent_type, mo, no, xmin, ymin, xmax, ymax, radius):
+    """在稠密类型网格上统计 (x, y) 的 (同类邻居数, 邻居总数)，-1 表示空单元。"""
+    similar = 0
+    total = 0
+    # 离边界至少 radius 的内部单元，所有偏移都落在界内：跳过逐个偏移的边界判断
+    if xmin + radius <= x < xmax - radius and ymin + radius <= y < ymax - radius:
+        # 最常用的半径 1 邻域（Von Neumann 4 / Moore 8）直接展开成常量下标，
+        # 省去偏移数组的读取与循环
+        if radius == 1 and len(mo) == 4:
+            nghs = (
+                type_grid[x - 1, y],
+                type_grid[x + 1, y],
+                type_grid[x, y - 1],
+                type_grid[x, y + 1],
+            )
+            for t in nghs:
+                if t >= 0:
+                    total += 1
+                    if t == agent_type:
+                        similar += 1
+            return similar, total
+        if radius == 1 and len(mo) == 8:
+            nghs = (
+                type_grid[x - 1, y - 1],
+                type_grid[x - 1, y],
+                type_grid[x - 1, y + 1],
+                type_grid[x, y - 1],
+                type_grid[x, y + 1],
+                type_grid[x + 1, y - 1],
+                type_grid[x + 1, y],
+                type_grid[x + 1, y + 1],
+            )
+            for t in nghs:
+                if t >= 0:
+                    total += 1
+                    if t == agent_type:
+                        similar += 1
+            return similar, total
+
+        for i in range(len(mo)):
+            t = type_grid[x + mo[i], y + no[i]]
+            if t >= 0:
+                total += 1
+                if t == agent_type:
+                    similar += 1
+        return similar, total
+
+    for i in range(len(mo)):
+        xi = x + mo[i]
+        yi = y + no[i]
+        if xmin <= xi < xmax and ymin <= yi < ymax:
+            t = type_grid[xi, yi]
+            if t >= 0:
+                total += 1
+                if t == agent_type:
+                    similar += 1
+    return similar, total
+
+
+@njit(cache=True)
+def _stamp_neighborhood(stamp, x, y, version, mo, no, xmin, ymin, xmax, ymax):
+    """把邻域包含 (x, y) 的所有单元的变更戳记为 version（偏移量关于原点对称）。"""
+    for i in range(len(mo)):
+        xi = x + mo[i]
+        yi = y + no[i]
+        if xmin <= xi < xmax and ymin <= yi < ymax:
+            stamp[xi, yi] = version
+
+
+@njit(cache=True)
+def _schelling_step(
+    type_grid,
+    xs,
+    ys,
+    types,
+    cutoffs,
+    always_happy,
+    happy,
+    moved,
+    seen,
+    stamp,
+    version,
+    empty_cells,
+    empty_slot,
+    n_empty,
+    rng,
+    mo,
+    no,
+    xmin,
+    ymin,
+    xmax,
+    ymax,
+    radius,
+):
+    """
+    在编译代码中完成一个 tick 的全部本地 Agent 行为：邻居计数、满意度判断与移动目标选择。
+
+    Agent 按下标顺序依次处理，每次移动立即更新 type_grid 与空单元索引，后面的 Agent
+    能看到前面的移动（顺序更新）；目标空位用 repast4py 的 NumPy Generator 均匀抽取。
+    网格（`SharedGrid`）本身不在这里修改，调用方根据 moved 与更新后的 xs/ys 补做 `grid.move`。
+
+    满意度只取决于邻域内的类型分布：每次移动都会递增 version，并把邻域包含新旧位置的单元的
+    变更戳 stamp 记为该值；seen 记录每个 Agent 上次评估时的 version。上次满意且所在单元的
+    变更戳不晚于 seen 的 Agent 结果必然不变，直接跳过计数。
+
+    返回:
+        Tuple[int, int]: 更新后的空单元数量与 version。
+    """
+    for i in range(len(xs)):
+        moved[i] = False
+        if always_happy[i]:
+            happy[i] = True
+            continue
+        if happy[i] and stamp[xs[i], ys[i]] <= seen[i]:
+            # 邻域自上次评估以来没有变化，仍然满意
+            continue
+        similar, total = _count_similar(
+            type_grid, xs[i], ys[i], types[i], mo, no, xmin, ymin, xmax, ymax, radius
+        )
+        seen[i] = version
+        # 整数门槛表代替逐个 Agent 的浮点除法；cutoffs[0] == 0，没有邻居时默认为满意
+        happy[i] = similar >= cutoffs[total]
+        if happy[i] or n_empty == 0:
+            # 本地没有空位时保持原地不动，Agent 在下一个 tick 再次尝试
+            continue
+
+        k = rng.integers(0, n_empty)
+        x = empty_cells[k, 0]
+        y = empty_cells[k, 1]
+
+        # 目标单元出索引（与末尾行交换），原位置入索引
+        n_empty -= 1
+        empty_slot[x, y] = -1
+        if k < n_empty:
+            empty_cells[k, 0] = empty_cells[n_empty, 0]
+            empty_cells[k, 1] = empty_cells[n_empty, 1]
+            empty_slot[empty_cells[k, 0], empty_cells[k, 1]] = k
+        empty_cells[n_empty, 0] = xs[i]
+        empty_cells[n_empty, 1] = ys[i]
+        empty_slot[xs[i], ys[i]] = n_empty
+        n_empty += 1
+
+        type_grid[xs[i], ys[i]] = -1
+        type_grid[x, y] = types[i]
+        version += 1
+        _stamp_neighborhood(
+            stamp, xs[i], ys[i], version, mo, no, xmin, ymin, xmax, ymax
+        )
+        _stamp_neighborhood(stamp, x, y, version, mo, no, xmin, ymin, xmax, ymax)
+        xs[i] = x
+        ys[i] = y
+        moved[i] = True
+    return n_empty, version
+
+
 @jitclass(cls_or_spec=spec)  # type: ignore
 class GridNghFinder:
     """
-    一个 Numba 优化的类，用于计算网格上的 Moore 邻域。
+    一个 Numba 优化的类，保存网格上的邻域偏移量与边界。
 
-    这个类避免了在计算邻居坐标时 Python 循环的开销，这对于大型 Agent 模型的性能至关重要。
+    邻居计数与移动都在编译内核 `_schelling_step` 中完成，这个类只负责把偏移量、
+    边界与邻域半径打包在一起，供内核与变更戳更新使用。
 
     属性:
         mo (np.array): 8 个邻居的 X 轴偏移量。
         no (np.array): 8 个邻居的 Y 轴偏移量。
         xmin, ymin (int): 网格的最小边界。
         xmax, ymax (int): 网格的最大边界。
+        radius (int): 邻域半径（偏移量的最大绝对值）。
     """
 
     def __init__(self, xmin, ymin, xmax, ymax, mo, no):
@@ -124,36 +287,7 @@ class GridNghFinder:
         self.ymin = ymin
         self.xmax = xmax
         self.ymax = ymax
-
-    def find(self, x, y):
-        """
-        计算特定网格单元的邻居坐标。
-
-        参数:
-            x (int): 中心单元的 x 坐标。
-            y (int): 中心单元的 y 坐标。
-
-        返回:
-            np.array: 有效邻居坐标的 2D 数组 (x, y, 0)。
-                      超出网格边界的坐标会被过滤掉 (Sticky 边界)。
-        """
-        xs = self.mo + x
-        ys = self.no + y
-
-        # 针对 Sticky 边界进行过滤（非周期性）
-        # 示例通常使用 Sticky 边界，因此我们过滤越界坐标。
-        # 如果是周期性网格，我们会进行取模运算。
-        # 根据参数假设为 Sticky（非周期性）。
-
-        xd = (xs >= self.xmin) & (xs < self.xmax)
-        xs = xs[xd]
-        ys = ys[xd]
-
-        yd = (ys >= self.ymin) & (ys < self.ymax)
-        xs = xs[yd]
-        ys = ys[yd]
-
-        return np.stack((xs, ys, np.zeros(len(ys), dtype=np.int32)), axis=-1)
+        self.radius = max(np.abs(mo).max(), np.abs(no).max())
 
 
 class SchellingAgent(core.Agent):
@@ -165,7 +299,10 @@ class SchellingAgent(core.Agent):
     属性:
         agent_type (int): 组标识符（0 或 1）。
         threshold (float): 感到满意所需的相似邻居的最小比例。
-        happy (bool): Agent 当前的满意度状态。
+        happy (bool): Agent 当前的满意度状态（`Model.agent_happy` 的镜像）。
+        location (DiscretePoint): 当前位置（`Model.agent_x`/`agent_y` 的镜像）。
+
+    本地 Agent 的状态以模型上的列数组为准，由 `Model.step` 更新后回写到这里。
     """
 
     TYPE = 0
@@ -183,6 +320,7 @@ class SchellingAgent(core.Agent):
         self.threshold = threshold
         self.happy = False
         self.always_happy = always_happy
+        self.location = None
 
     def save(self) -> Tuple:
         """
@@ -199,71 +337,23 @@ class SchellingAgent(core.Agent):
             self.always_happy,
         )
 
-    def step(self, model):
-        """
-        Agent 的主要行为循环。
-
-        1. 使用模型的 `ngh_finder` 识别邻居。
-        2. 计算相似邻居的比例。
-        3. 更新 `happy` 状态。
-        4. 如果不满意则移动。
-
-        参数:
-            model (Model): 仿真模型实例。
-        """
-        grid = model.grid
-        pt = grid.get_location(self)
-
-        if pt is None:
-            return
-
-        if self.always_happy:
-            self.happy = True
-            return
 
-        # 检查邻居
-        nghs = model.ngh_finder.find(pt.x, pt.y)
-
-        similar = 0
-        total_neighbors = 0
-
-        at = dpt(0, 0, 0)
-        for ngh in nghs:
-            at._reset_from_array(ngh)
-            for neighbor in grid.get_agents(at):
-                # 不统计自己（如果 get_agents 返回包括自己在内的列表）
-                if neighbor.uid != self.uid:
-                    total_neighbors += 1
-                    if neighbor.agent_type == self.agent_type:
-                        similar += 1
-
-        if total_neighbors > 0:
-            similarity = similar / total_neighbors
-            self.happy = similarity >= self.threshold
-        else:
-            self.happy = True  # 如果没有邻居，则默认为满意。通常假设。
-
-        if not self.happy:
-            self.move(model)
+class EmptyCellIndex:
+    """
+    本地空单元的索引。
 
-    def move(self, model):
-        """
-        将 Agent 移动到网格范围内的一个新的随机空位置。
-        """
-        rng = random.default_rng
-        # 限制尝试次数以防止死循环（如果网格非常满）
-        for _ in range(100):
-            dest = model.grid.get_random_local_pt(rng)
-            # 检查目标位置当前是否为空
-            # SharedGrid 上的 get_agents() 将返回此秩 *本地* 的 Agent
-            # 或来自其他秩的缓冲 Agent。如果返回任何 Agent，则表示被占用。
-            if not any(model.grid.get_agents(dest)):
-                model.grid.move(self, dest)
-                return
+    空单元坐标紧凑地保存在 (容量, 2) 的 int32 数组 `cells` 的前 `n` 行中，另用与网格同形的
+    int32 表 `slot` 记录每个坐标所在的行（-1 表示非空）；删除时与末尾行交换，因此插入、
+    删除和均匀随机抽样都是 O(1)。这两个数组与 `n` 只由编译内核 `_schelling_step` 原地维护。
+    """
 
-        # 如果尝试多次后未找到空位，Agent 保持原地不动。
-        # 如果网格非常密集，这种情况可能会发生。
-        # Agent 在此 tick 保持不满意状态，并在下一个 tick 再次尝试。
+    def __init__(self, cells, shape: Tuple[int, int], capacity: int):
+        cells = np.asarray(list(cells), dtype=np.int32).reshape(-1, 2)
+        self.n = len(cells)
+        self.cells = np.empty((max(capacity, self.n), 2), dtype=np.int32)
+        self.cells[: self.n] = cells
+        self.slot = np.full(shape, -1, dtype=np.int32)
+        self.slot[cells[:, 0], cells[:, 1]] = np.arange(self.n, dtype=np.int32)
 
 
 agent_cache = {}
@@ -295,9 +385,29 @@ def restore_agent(agent_data: Tuple):
         agent_cache[uid] = agent
 
     agent.happy = agent_data[3]
+    # 位置由网格在恢复之后设置，缓存中的旧位置已失效
+    agent.location = None
     return agent
 
 
+class BatchTabularLogger(logging.TabularLogger):
+    """
+    支持一次追加多行的 `TabularLogger`。
+
+    `log_row` 每条记录都要经过一次 Python 方法调用；按 tick 批量追加可以省去这部分开销，
+    写出（`write`/`close`）的行为与父类完全相同。
+    """
+
+    def log_rows(self, rows: List[Tuple]):
+        """
+        追加多行数据，每个元组对应一行，列顺序与构造函数中的 headers 一致。
+
+        参数:
+            rows (List[Tuple]): 待写出的行。
+        """
+        self._rows.extend(rows)
+
+
 @dataclass
 class Summary:
     """
@@ -335,6 +445,10 @@ class Model:
         self.runner.schedule_repeating_event(1, 1, self.step)
         self.runner.schedule_stop(params["stop.at"])
         self.runner.schedule_end_event(evt=self.at_end)
+        # 全局停止条件需要一次同步的 allreduce。默认每个 tick 检查（与原行为一致）；
+        # 大规模 MPI 运行可把 stop_check_interval 设为 K，每 K 个 tick 才同步一次，
+        # 最终状态不变，但运行与逐 tick 日志最多会多出 K-1 个 tick
+        self._check_interval = max(1, int(params.get("stop_check_interval", 1)))
 
         self.context = ctx.SharedContext(comm=comm)
 
@@ -362,6 +476,13 @@ class Model:
             0, 0, self.world_width, self.world_height, mo, no
         )
 
+        # 稠密类型网格（按 [x, y] 索引）：-1 表示空，否则为所在 Agent 的类型。
+        # 本地 Agent 在放置/移动时同步更新，缓冲区（幽灵单元）在每次同步后刷新。
+        self.buffer_size = int(max_dist)
+        self.type_grid = np.full(
+            (self.world_width, self.world_height), -1, dtype=np.int8
+        )
+
         # 初始化 Agent
         # 在各秩之间分配 Agent 创建任务
         world_size = comm.Get_size()
@@ -375,26 +496,77 @@ class Model:
         if self.rank < (total_agents % world_size):
             my_agent_count += 1
 
+        lb = self.grid.get_local_bounds()
+        local_cells = [
+            (x, y)
+            for x in range(lb.xmin, lb.xmin + lb.xextent)
+            for y in range(lb.ymin, lb.ymin + lb.yextent)
+        ]
+        if my_agent_count > len(local_cells):
+            raise ValueError(
+                f"Rank {self.rank}: {my_agent_count} agents do not fit in "
+                f"{len(local_cells)} local cells"
+            )
+
         rng = random.default_rng
         threshold = params["threshold"]
         always_happy_ratio = params.get("always_happy_ratio", 0.0)
 
-        happy_count = 0
+        # 一次性抽取全部类型、"总是满意"标记与互不重复的初始位置，
+        # 不再逐个 Agent 地拒绝采样空位
+        # 类型大约 50/50 分裂，或随机
+        a_types = rng.integers(0, 2, size=my_agent_count)
+        always_happy = rng.random(my_agent_count) < always_happy_ratio
+        slots = rng.permutation(len(local_cells))
+        happy_count = int(always_happy.sum())
+
         for i in range(my_agent_count):
-            # 类型大约 50/50 分裂，或随机
-            a_type = rng.integers(0, 2)
-            is_always_happy = rng.random() < always_happy_ratio
-            if is_always_happy:
-                happy_count += 1
-            agent = SchellingAgent(i, self.rank, a_type, threshold, is_always_happy)
+            agent = SchellingAgent(
+                i, self.rank, int(a_types[i]), threshold, bool(always_happy[i])
+            )
             self.context.add(agent)
 
-            # 放置在随机位置，确保为空
-            while True:
-                pt = self.grid.get_random_local_pt(rng)
-                if not any(self.grid.get_agents(pt)):
-                    self.grid.move(agent, pt)
-                    break
+            x, y = local_cells[slots[i]]
+            pt = dpt(x, y, 0)
+            self.grid.move(agent, pt)
+            self.type_grid[x, y] = a_types[i]
+            agent.location = pt
+
+        # 本地 Agent 的状态按列（SoA）保存在模型上，顺序与 context 中一致，
+        # 编译内核直接原地读写这些数组。Agent 只会移动到本地空单元，不会迁出本秩，
+        # 因此这组 Agent 在整个运行期间不变，数组只需在这里构建一次。
+        # 初始化之后这些列是本地 Agent 位置与满意度的唯一权威来源：Agent 对象上的
+        # location/happy 只是镜像，由 Model.step 在内核返回后回写（幽灵序列化与网格需要它们），
+        # 不要直接修改 Agent 对象来移动 Agent 或改变其满意度
+        self.local_agents = list(self.context.agents())
+        n_local = len(self.local_agents)
+        self.agent_x = np.empty(n_local, dtype=np.int32)
+        self.agent_y = np.empty(n_local, dtype=np.int32)
+        self.agent_types = np.empty(n_local, dtype=np.int8)
+        self.agent_always_happy = np.empty(n_local, dtype=np.bool_)
+        for i, agent in enumerate(self.local_agents):
+            self.agent_x[i] = agent.location.x
+            self.agent_y[i] = agent.location.y
+            self.agent_types[i] = agent.agent_type
+            self.agent_always_happy[i] = agent.always_happy
+        self.agent_ids = [agent.id for agent in self.local_agents]
+        self.agent_ranks = [agent.uid[2] for agent in self.local_agents]
+        self.agent_happy = np.zeros(n_local, dtype=np.bool_)
+        # 增量满意度评估：每次类型网格变化递增 change_version，并给受影响的单元打上变更戳；
+        # agent_seen 记录各 Agent 上次评估时的版本，初始为 -1，保证第一个 tick 全部评估
+        self.change_version = 0
+        self.change_stamp = np.zeros(self.type_grid.shape, dtype=np.int64)
+        self.agent_seen = np.full(n_local, -1, dtype=np.int64)
+        # 所有本地 Agent 共用同一阈值，满意度判断用预先换算好的整数门槛表
+        self.similarity_cutoffs = similarity_cutoffs(threshold, len(mo))
+        self.agent_moved = np.zeros(n_local, dtype=np.bool_)
+
+        # 本秩本地区域内的空单元索引（未被选中的位置），移动 Agent 时增量维护
+        self.empty_cells = EmptyCellIndex(
+            (local_cells[j] for j in slots[my_agent_count:]),
+            self.type_grid.shape,
+            len(local_cells),
+        )
 
         if self.rank == 0:
             print(
@@ -414,7 +586,7 @@ class Model:
             loggers, comm, params["summary_log_file"]
         )
 
-        self.agent_logger = logging.TabularLogger(
+        self.agent_logger = BatchTabularLogger(
             comm,
             params["agent_log_file"],
             ["tick", "agent_id", "rank", "type", "happy", "x", "y"],
@@ -424,7 +596,7 @@ class Model:
         """
         执行仿真的一步（tick）。
 
-        1. **Agent 行为**：对本地上下文中的所有 Agent 调用 `step()`。
+        1. **Agent 行为**：由编译内核按顺序处理本地 Agent（满意度判断与移动）。
         2. **同步**：同步上下文以处理 Agent 在进程间的移动。
         3. **日志记录**：记录 Agent 的当前状态和聚合统计数据。
         """
@@ -434,44 +606,87 @@ class Model:
         # 我们基于*当前*状态（tick 开始时）检查满意度，然后移动。
         # 这是同步的。
 
-        for agent in self.context.agents():
-            agent.step(self)
+        # 整个 tick 的本地 Agent 行为交给编译内核 `_schelling_step`：按 context 中的顺序
+        # 逐个评估并移动，语义与逐个调用 agent.step 相同。
+        # happy 标志会随 Agent 迁移，全局总和不变。
+        agents = self.local_agents
+        xs, ys = self.agent_x, self.agent_y
+        happy, moved = self.agent_happy, self.agent_moved
+        was_happy = happy.copy()
+        finder = self.ngh_finder
+        empty_cells = self.empty_cells
+        empty_cells.n, self.change_version = _schelling_step(
+            self.type_grid,
+            xs,
+            ys,
+            self.agent_types,
+            self.similarity_cutoffs,
+            self.agent_always_happy,
+            happy,
+            moved,
+            self.agent_seen,
+            self.change_stamp,
+            self.change_version,
+            empty_cells.cells,
+            empty_cells.slot,
+            empty_cells.n,
+            random.default_rng,
+            finder.mo,
+            finder.no,
+            finder.xmin,
+            finder.ymin,
+            finder.xmax,
+            finder.ymax,
+            finder.radius,
+        )
+
+        # 内核只更新了 type_grid 与空单元索引，这里按处理顺序把移动同步到网格
+        for i in np.flatnonzero(moved).tolist():
+            dest = dpt(int(xs[i]), int(ys[i]), 0)
+            self.grid.move(agents[i], dest)
+            agents[i].location = dest
+
+        # 满意计数直接对 happy 列求和；Agent 对象上的 happy（幽灵序列化时使用）
+        # 只回写本 tick 发生变化的那些，不再逐个 Agent 赋值
+        for i in np.flatnonzero(happy != was_happy).tolist():
+            agents[i].happy = bool(happy[i])
+        local_happy = int(happy.sum())
 
         self.context.synchronize(restore_agent)
+        self._refresh_ghost_types()
 
         # 日志记录
         tick = self.runner.schedule.tick
 
-        local_happy = 0
-        local_total = 0
-        for agent in self.context.agents():
-            local_total += 1
-            if agent.happy:
-                local_happy += 1
-
-            pt = self.grid.get_location(agent)
-            if pt is None:
-                continue
-            self.agent_logger.log_row(
-                tick,
-                agent.id,
-                agent.uid[2],
-                agent.agent_type,
-                int(agent.happy),
-                pt.x,
-                pt.y,
+        local_total = self.context.size([SchellingAgent.TYPE])[SchellingAgent.TYPE]
+
+        # 本 tick 的日志行直接由列数组拼出（各列一次 tolist），不再逐个 Agent 读取属性；
+        # 所有行一次性交给日志器
+        rows = list(
+            zip(
+                itertools.repeat(tick, len(agents)),
+                self.agent_ids,
+                self.agent_ranks,
+                self.agent_types.tolist(),
+                happy.view(np.int8).tolist(),
+                xs.tolist(),
+                ys.tolist(),
             )
+        )
+        self.agent_logger.log_rows(rows)
 
         self.summary.total_happy = local_happy
         self.summary.total_agents = local_total
         self.summary.percent_happy = 0  # 由 Reducer 或后处理计算？Reducer 汇总字段。
 
-        # 检查全局停止条件（没有不满意的 Agent）
-        local_unhappy = local_total - local_happy
-        total_unhappy = self.comm.allreduce(local_unhappy, op=MPI.SUM)
+        # 检查全局停止条件（没有不满意的 Agent）。
+        # 全体满意后不会再有 Agent 移动，因此晚几个 tick 停止不影响结果。
+        if int(tick) % self._check_interval == 0:
+            local_unhappy = local_total - local_happy
+            total_unhappy = self.comm.allreduce(local_unhappy, op=MPI.SUM)
 
-        if total_unhappy == 0:
-            self.runner.stop()
+            if total_unhappy == 0:
+                self.runner.stop()
 
         # 我们无法轻易在 Reducer 内部自动计算百分比用于日志，除非定义自定义操作。
         # 但我们记录了总数，所以可以稍后计算百分比。
@@ -479,6 +694,61 @@ class Model:
         self.data_set.log(tick)
         self.agent_logger.write()
 
+    def _refresh_ghost_types(self):
+        """
+        用同步后的缓冲区（幽灵单元）内容刷新 `type_grid` 中属于相邻秩的部分。
+
+        本地区域由 Agent 移动时增量维护，这里只需遍历本地边界外 `buffer_size`
+        宽的条带。单进程运行时没有幽灵单元，直接返回。
+        """
+        if self.comm.Get_size() == 1:
+            return
+
+        lb = self.grid.get_local_bounds()
+        lx0, lx1 = lb.xmin, lb.xmin + lb.xextent
+        ly0, ly1 = lb.ymin, lb.ymin + lb.yextent
+        x0 = max(lx0 - self.buffer_size, 0)
+        x1 = min(lx1 + self.buffer_size, self.world_width)
+        y0 = max(ly0 - self.buffer_size, 0)
+        y1 = min(ly1 + self.buffer_size, self.world_height)
+
+        # 复用同一个 DiscretePoint 并提前绑定方法，减少每个单元的 Python/C 往返；
+        # 本地列只访问上下两段条带，不再逐个跳过本地内部单元
+        get_agents = self.grid.get_agents
+        type_grid = self.type_grid
+        at = dpt(0, 0, 0)
+        changed = []
+        for x in range(x0, x1):
+            if lx0 <= x < lx1:
+                ys = itertools.chain(range(y0, ly0), range(ly1, y1))
+            else:
+                ys = range(y0, y1)
+            for y in ys:
+                at._reset2D(x, y)
+                ghost = next(iter(get_agents(at)), None)
+                t = -1 if ghost is None else ghost.agent_type
+                if type_grid[x, y] != t:
+                    type_grid[x, y] = t
+                    changed.append((x, y))
+
+        # 幽灵单元的变化同样会影响边界附近本地 Agent 的满意度，需要打上变更戳
+        if changed:
+            self.change_version += 1
+            finder = self.ngh_finder
+            for x, y in changed:
+                _stamp_neighborhood(
+                    self.change_stamp,
+                    x,
+                    y,
+                    self.change_version,
+                    finder.mo,
+                    finder.no,
+                    finder.xmin,
+                    finder.ymin,
+                    finder.xmax,
+                    finder.ymax,
+                )
+
     def at_end(self):
         """
         在仿真结束时调用的清理方法。
@@ -491,28 +761,22 @@ class Model:
         if self.rank == 0 and "moran_file" in self.params:
             moran_file = self.params["moran_file"]
             try:
-                # Build grid matrix
-                # Note: This assumes n=1 or that we only care about local agents if distributed.
-                # For n=1 (single process), local agents are all agents.
-
-                # Use numpy.full with NaN
-                grid_matrix = np.full((self.world_height, self.world_width), np.nan)
-
-                for agent in self.context.agents():
-                    pt = self.grid.get_location(agent)
-                    if pt:
-                        # Value: 1 for type 1, -1 for type 0 (matching final_stats.py logic)
-                        val = 1 if agent.agent_type == 1 else -1
-                        # Repast grid coords might need checking, but usually 0..W-1
-                        if (
-                            0 <= pt.x < self.world_width
-                            and 0 <= pt.y < self.world_height
-                        ):
-                            grid_matrix[pt.y, pt.x] = val
-
-                moran_i = calculate_morans_i(grid_matrix)
-
-                import os
+                # Build grid matrix directly from the incrementally maintained type grid
+                # (indexed [x, y]; the matrix is [y, x]). Only the local region is used:
+                # this assumes n=1 or that we only care about local agents if distributed.
+                # Value: 1 for type 1, -1 for type 0 (matching final_stats.py logic);
+                # occupancy is passed as a mask so Moran's I skips the NaN scans
+                lb = self.grid.get_local_bounds()
+                x0, x1 = lb.xmin, lb.xmin + lb.xextent
+                y0, y1 = lb.ymin, lb.ymin + lb.yextent
+                local = self.type_grid[x0:x1, y0:y1].T
+
+                grid_matrix = np.zeros((self.world_height, self.world_width))
+                occupied = np.zeros((self.world_height, self.world_width), dtype=bool)
+                grid_matrix[y0:y1, x0:x1] = np.where(local == 1, 1.0, -1.0)
+                occupied[y0:y1, x0:x1] = local >= 0
+
+                moran_i = calculate_morans_i(grid_matrix, mask=occupied)
 
                 os.makedirs(os.path.dirname(moran_file), exist_ok=True)
                 with open(moran_file, "w") as f:
@@ -528,19 +792,54 @@ class Model:
         self.runner.execute()
 
 
-def run(params: Dict):
+def run(params: Dict, comm: MPI.Intracomm = MPI.COMM_WORLD):
     """
     设置和运行模型的入口点。
 
     参数:
         params (Dict): 从命令行或文件解析的参数字典。
+        comm (MPI.Intracomm): 模型使用的通信器，默认为 `MPI.COMM_WORLD`。
     """
-    model = Model(MPI.COMM_WORLD, params)
+    agent_cache.clear()
+    model = Model(comm, params)
     model.start()
 
 
+def run_sweep(params: Dict):
+    """
+    以扫描模式运行：每个 MPI 进程独立运行参数点的一个切片。
+
+    参数扫描中的各个点互不依赖，与其把一次运行拆分到多个进程（每个 tick 都要同步幽灵单元），
+    不如把 `MPI.COMM_WORLD` 拆成大小为 1 的子通信器，让 `mpirun -n K` 同时跑 K 个独立运行。
+
+    参数:
+        params (Dict): 基础参数字典。`sweep` 键为覆盖参数字典的列表，每个字典描述一个
+                       参数点（需包含各自的输出文件路径）；进程 r 运行第 r, r+K, r+2K, ... 个点。
+    """
+    world = MPI.COMM_WORLD
+    rank, size = world.Get_rank(), world.Get_size()
+    comm = world.Split(color=rank, key=0)
+
+    base = {k: v for k, v in params.items() if k != "sweep"}
+    for overrides in params.get("sweep", [])[rank::size]:
+        run_params = {**base, **overrides}
+        if "random.seed" in run_params:
+            random.init(run_params["random.seed"])
+        run(run_params, comm)
+
+    comm.Free()
+
+
 if __name__ == "__main__":
     parser = parameters.create_args_parser()
+    parser.add_argument(
+        "--sweep-mode",
+        action="store_true",
+        help="把参数中的 `sweep` 列表分配给各进程，每个进程独立运行（不跨进程划分网格）",
+    )
     args: Namespace = parser.parse_args()
     params = parameters.init_params(args.parameters_file, args.parameters)
-    run(params)
+    if args.sweep_mode:
+        run_sweep(params)
+    else:
+        run(params)
@@ -0,0 +1,7 @@
+"""
+分析脚本。请在 lecture_03 目录下以模块方式运行，例如
+`python -m scripts.final_stats calc <input_log_csv> <output_file>`。
+
+这样 analysis_utils 始终以 scripts.analysis_utils 的名字导入，与 schelling.py 一致：
+Numba 的磁盘缓存记录了导入时的模块名，名字不一致时缓存的内核无法加载。
+"""
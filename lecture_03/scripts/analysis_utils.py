@@ -1,150 +1,374 @@
 import glob
+import io
 import os
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import pandas as pd
-from scipy.signal import convolve2d
+from numba import njit
 
+# pandas is imported inside the functions that build DataFrames: schelling.py and
+# the scripts that only read moran.csv values use this module without needing it,
+# and skipping it saves a noticeable part of their start-up time
 
-def load_data(log_file):
+# Narrow dtypes for the agent log columns written by schelling.py; declaring
+# them up front skips type inference and keeps the frame small
+AGENT_LOG_DTYPES = {
+    "tick": "int32",
+    "agent_id": "int32",
+    "rank": "int32",
+    "type": "int8",
+    "happy": "int8",
+    "x": "int32",
+    "y": "int32",
+}
+
+
+def _read_csv(source, usecols=None):
+    """read_csv with the agent log dtypes, optionally restricted to usecols."""
+    if usecols is not None:
+        # A callable selector skips columns a log does not have instead of raising
+        usecols = set(usecols).__contains__
+    import pandas as pd
+
+    return pd.read_csv(source, usecols=usecols, dtype=AGENT_LOG_DTYPES, engine="c")
+
+
+def _merge_shards(files):
+    """
+    Join CSV shards as raw bytes under a single header line.
+
+    Returns None if the shard headers differ and the files cannot simply be
+    appended to each other.
+    """
+    header = None
+    chunks = []
+    for f in files:
+        with open(f, "rb") as fh:
+            first = fh.readline()
+            if not first.endswith(b"\n"):
+                first += b"\n"
+            if header is None:
+                header = first
+                chunks.append(first)
+            elif first != header:
+                return None
+            body = fh.read()
+        if body and not body.endswith(b"\n"):
+            body += b"\n"
+        chunks.append(body)
+    return b"".join(chunks)
+
+
+def _read_shards(files, usecols=None):
+    """
+    Parse several CSV shards with a single read_csv call.
+
+    The shards are merged at the byte level so the parser runs once. Falls
+    back to per-file parsing if the headers differ.
+    """
+    merged = _merge_shards(files)
+    if merged is None:
+        import pandas as pd
+
+        return pd.concat((_read_csv(f, usecols) for f in files), ignore_index=True)
+    return _read_csv(io.BytesIO(merged), usecols)
+
+
+# Archive entries that describe the parsed sources rather than hold log columns
+_CACHE_SOURCES = "__sources__"
+_CACHE_STATS = "__source_stats__"
+
+
+def _source_signature(sources):
+    """Source file names with their (size, mtime_ns), in a stable order."""
+    names = sorted(sources, key=os.path.basename)
+    stats = [os.stat(f) for f in names]
+    return (
+        np.array([os.path.basename(f) for f in names]),
+        np.array([(st.st_size, st.st_mtime_ns) for st in stats], dtype=np.int64),
+    )
+
+
+def _load_npz_cache(cache_file, sources, usecols=None):
+    """
+    Return the cached frame if cache_file was built from exactly these sources
+    (same file names, sizes and modification times), else None.
+
+    np.load reads the archive lazily, so only the requested columns are
+    loaded from disk. An unreadable or damaged archive also yields None, so
+    the caller re-parses the CSV.
+    """
+    if not os.path.exists(cache_file):
+        return None
+    import pandas as pd
+
+    names, stats = _source_signature(sources)
+    try:
+        with np.load(cache_file) as archive:
+            if _CACHE_SOURCES not in archive.files or _CACHE_STATS not in archive.files:
+                return None
+            if not (
+                np.array_equal(archive[_CACHE_SOURCES], names)
+                and np.array_equal(archive[_CACHE_STATS], stats)
+            ):
+                return None
+            columns = [
+                c
+                for c in archive.files
+                if c not in (_CACHE_SOURCES, _CACHE_STATS)
+                and (usecols is None or c in usecols)
+            ]
+            return pd.DataFrame({c: archive[c] for c in columns})
+    except (OSError, ValueError, zipfile.BadZipFile, EOFError):
+        return None
+
+
+def _save_npz_cache(cache_file, df, sources):
+    """
+    Store the parsed columns as one compressed .npy array each inside
+    cache_file, along with the signature of the sources they were parsed from.
+
+    The archive is written to a temporary file next to cache_file and renamed
+    into place, so concurrent or interrupted runs never leave a truncated
+    cache behind.
+    """
+    if any(dtype.kind == "O" for dtype in df.dtypes):
+        return  # object columns would need pickling: not worth caching
+    names, stats = _source_signature(sources)
+    arrays = {c: df[c].to_numpy() for c in df.columns}
+    arrays[_CACHE_SOURCES] = names
+    arrays[_CACHE_STATS] = stats
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "wb") as fh:
+            np.savez_compressed(fh, **arrays)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # read-only results directory or full disk: just skip the cache
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def load_data(log_file, usecols=None):
     """
     Load Agent log data, handling potentially split MPI files (e.g., agent_log_1.csv).
+    Pass usecols to get only the columns the caller needs. The first call
+    parses the CSV source(s) in full and stores the columns in a compressed
+    <name>.npz cache written next to the log (e.g. agent_log.npz beside
+    agent_log.csv; ignored by git); later calls load just the requested
+    columns from it as long as the same source files, with unchanged sizes
+    and modification times, would be parsed. Delete the .npz file to drop
+    the cache.
     """
+    root, ext = os.path.splitext(log_file)
+    base_name = log_file.replace(".csv", "_*.csv")
+    files = glob.glob(base_name)
+
     if not os.path.exists(log_file):
         # Try finding split files
-        base_name = log_file.replace(".csv", "_*.csv")
-        files = glob.glob(base_name)
         if not files:
             return None
-        df = pd.concat((pd.read_csv(f) for f in files), ignore_index=True)
+        sources = files
+    # Check for split files even if main file exists. The larger source wins,
+    # decided from the on-disk sizes so only one of them is ever parsed
+    elif files and sum(os.path.getsize(f) for f in files) > os.path.getsize(log_file):
+        sources = files
     else:
-        df = pd.read_csv(log_file)
-        # Check for split files even if main file exists
-        base_name = log_file.replace(".csv", "_*.csv")
-        files = glob.glob(base_name)
-        if files:
-            split_df = pd.concat((pd.read_csv(f) for f in files), ignore_index=True)
-            if len(split_df) > len(df):
-                df = split_df
+        sources = [log_file]
+
+    cache_file = root + ".npz" if ext == ".csv" else None
+    if cache_file is not None:
+        df = _load_npz_cache(cache_file, sources, usecols)
+        if df is not None:
+            return df
+
+    df = _read_shards(sources) if len(sources) > 1 else _read_csv(sources[0])
+    if cache_file is not None:
+        _save_npz_cache(cache_file, df, sources)
+    if usecols is not None:
+        df = df[[c for c in df.columns if c in set(usecols)]]
     return df
 
 
-def calculate_morans_i(grid_matrix):
+@njit(cache=True)
+def _morans_core(grid, mask, use_mask):
     """
-    Calculate Global Moran's I for a grid matrix (numpy array) using fast convolution.
-    NaN values are treated as empty cells.
+    Fused two-pass Moran's I kernel over the Moore neighborhood (8 neighbors).
 
-    This vectorized implementation is significantly faster than nested loops.
+    The first pass counts the valid (non-NaN) cells, sums their values and
+    tracks their range, returning early for constant grids; the second pass
+    accumulates the sum of squared deviations (denominator), the number of
+    valid neighbor pairs (W) and the cross-product sum of deviations
+    (numerator). No grid-sized temporaries are allocated. Cells outside the
+    grid are treated as empty. When use_mask is set, validity is read from the
+    boolean mask instead of probing for NaN. Returns (N, W, num, denom).
     """
-    # Create a mask for valid (non-NaN) cells
-    mask = ~np.isnan(grid_matrix)
+    rows, cols = grid.shape
 
-    # Extract values
-    values = grid_matrix.copy()
-    values[~mask] = 0  # Zero out NaNs to not affect sums
+    N = 0
+    total = 0.0
+    lo = np.inf
+    hi = -np.inf
+    for r in range(rows):
+        for c in range(cols):
+            v = grid[r, c]
+            if mask[r, c] if use_mask else not np.isnan(v):
+                N += 1
+                total += v
+                lo = min(lo, v)
+                hi = max(hi, v)
 
-    # Count valid cells
-    N = np.sum(mask)
-    if N < 2:
-        return np.nan
+    # A constant grid has zero variance: skip the stencil pass entirely
+    if N < 2 or lo == hi:
+        return N, 0, 0.0, 0.0
+    mean_val = total / N
 
-    # Calculate mean of valid cells
-    mean_val = np.sum(values) / N
+    W = 0
+    num = 0.0
+    denom = 0.0
+    for r in range(rows):
+        for c in range(cols):
+            v = grid[r, c]
+            if mask[r, c] if use_mask else not np.isnan(v):
+                zi = v - mean_val
+                denom += zi * zi
+                # sum_j zi * (vj - mean) == zi * (sum_j vj - k * mean): sum the raw
+                # neighbor values and center once per cell instead of once per pair
+                k = 0
+                s = 0.0
+                for dr in range(-1, 2):
+                    nr = r + dr
+                    if 0 <= nr < rows:
+                        for dc in range(-1, 2):
+                            nc = c + dc
+                            if (dr != 0 or dc != 0) and 0 <= nc < cols:
+                                vj = grid[nr, nc]
+                                if mask[nr, nc] if use_mask else not np.isnan(vj):
+                                    k += 1
+                                    s += vj
+                W += k
+                num += zi * (s - k * mean_val)
+    return N, W, num, denom
 
-    # Calculate deviations
-    z = np.zeros_like(grid_matrix)
-    z[mask] = grid_matrix[mask] - mean_val
 
-    # Denominator: sum of squared deviations
-    denom = np.sum(z[mask] ** 2)
-    if denom == 0:
+def calculate_morans_i(grid_matrix, mask=None):
+    """
+    Calculate Global Moran's I for a grid matrix (numpy array) using a
+    Numba-compiled stencil over the Moore neighborhood.
+    NaN values are treated as empty cells. If a boolean ``mask`` of the same
+    shape is given, it marks the occupied cells instead and the NaN scans are
+    skipped; values outside the mask are ignored.
+    """
+    grid = np.ascontiguousarray(grid_matrix, dtype=np.float64)
+    if mask is None:
+        N, W, num, denom = _morans_core(grid, np.empty((0, 0), dtype=np.bool_), False)
+    else:
+        mask = np.ascontiguousarray(mask, dtype=np.bool_)
+        if mask.shape != grid.shape:
+            raise ValueError(
+                f"mask shape {mask.shape} does not match grid shape {grid.shape}"
+            )
+        N, W, num, denom = _morans_core(grid, mask, True)
+
+    if N < 2 or denom == 0 or W == 0:
         return np.nan
 
-    # Define kernel for Moore neighborhood (8 neighbors)
-    kernel = np.array([[1, 1, 1], [1, 0, 1], [1, 1, 1]])
+    return (N / W) * (num / denom)
 
-    # Calculate W: Sum of weights (valid neighbor pairs)
-    # Convolve mask with kernel to get count of valid neighbors for each cell
-    valid_neighbor_counts = convolve2d(
-        mask.astype(int), kernel, mode="same", boundary="fill", fillvalue=0
-    )
-    # Sum these counts only for valid central cells
-    W = np.sum(valid_neighbor_counts[mask])
 
-    if W == 0:
-        return np.nan
+# Path components like "n_8" or "t_0.5"; ints for grid/neighbourhood/seed, floats otherwise
+_PARAM_RE = re.compile(r"^([hgnts])_([-+\d.eE]+)$")
+_PARAM_CASTS = {"h": float, "g": int, "n": int, "t": float, "s": int}
 
-    # Calculate Numerator: sum_i sum_j w_ij * z_i * z_j
-    # convolution of z with kernel gives sum_j w_ij * z_j for each i
-    neighbor_z_sum = convolve2d(z, kernel, mode="same", boundary="fill", fillvalue=0)
 
-    # Multiply by z_i and sum over valid i
-    num = np.sum(z[mask] * neighbor_z_sum[mask])
+def _parse_param_dir(name, params):
+    """Return params updated with the value encoded in a directory name, if any."""
+    m = _PARAM_RE.match(name)
+    if m is None:
+        return params
+    key, raw = m.groups()
+    try:
+        value = _PARAM_CASTS[key](raw)
+    except ValueError:
+        return params
+    return {**params, key: value}
 
-    return (N / W) * (num / denom)
+
+def _scan_results(path, params, out):
+    """Recursively collect (moran.csv path, params) pairs below path."""
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry)
+            elif entry.name == "moran.csv":
+                out.append((entry.path, params))
+    for entry in subdirs:
+        _scan_results(entry.path, _parse_param_dir(entry.name, params), out)
+
+
+def read_float_files(paths, max_workers=16):
+    """
+    Read many files that each hold a single float, overlapping the reads.
+
+    The files are tiny, so the cost is per-file syscall latency; a thread pool
+    hides most of it. Returns a list aligned with paths, with None for empty
+    or unreadable files (the latter are reported).
+    """
+
+    def read(path):
+        try:
+            with open(path, "r") as f:
+                content = f.read().strip()
+            return float(content) if content else None
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+            return None
+
+    if len(paths) < 2:
+        return [read(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(read, paths))
 
 
 def parse_results(root_dir="results"):
     """
     Parse result directories to extract parameters and metrics.
     """
+    # Expected format: .../h_{always_happy}/n_{nh_size}/t_{threshold}/s_{seed}
+    # Or old format: .../g_{size}/...
+    params = {}
+    for part in os.path.normpath(root_dir).split(os.sep):
+        params = _parse_param_dir(part, params)
+
+    found = []
+    if os.path.isdir(root_dir):
+        _scan_results(root_dir, params, found)
+
+    # Minimal requirement: neighbourhood size and threshold
+    found = [(path, run) for path, run in found if "n" in run and "t" in run]
+    values = read_float_files([path for path, _ in found])
+
     data = []
+    for (_, run), moran_i in zip(found, values):
+        if moran_i is None:
+            continue
+        entry = {
+            "Neighborhood Size": run["n"],
+            "Threshold": run["t"],
+            "Seed": run.get("s"),
+            "Moran's I": moran_i,
+        }
+        if "h" in run:
+            entry["Always Happy"] = run["h"]
+        if "g" in run:
+            entry["Grid Size"] = run["g"]
+        data.append(entry)
 
-    # Walk through the directory structure
-    for root, dirs, files in os.walk(root_dir):
-        if "moran.csv" in files:
-            # Expected format: .../h_{always_happy}/n_{nh_size}/t_{threshold}/s_{seed}
-            # Or old format: .../g_{size}/...
-            path_parts = root.split(os.sep)
-
-            h_val, g_val, n_val, t_val, s_val = None, None, None, None, None
-
-            for part in path_parts:
-                if part.startswith("h_"):
-                    try:
-                        h_val = float(part.split("_")[1])
-                    except ValueError:
-                        pass
-                elif part.startswith("g_"):
-                    try:
-                        g_val = int(part.split("_")[1])
-                    except ValueError:
-                        pass
-                elif part.startswith("n_"):
-                    try:
-                        n_val = int(part.split("_")[1])
-                    except ValueError:
-                        pass
-                elif part.startswith("t_"):
-                    try:
-                        t_val = float(part.split("_")[1])
-                    except ValueError:
-                        pass
-                elif part.startswith("s_"):
-                    try:
-                        s_val = int(part.split("_")[1])
-                    except ValueError:
-                        pass
-
-            if None not in [n_val, t_val]:  # Minimal requirement
-                try:
-                    file_path = os.path.join(root, "moran.csv")
-                    with open(file_path, "r") as f:
-                        content = f.read().strip()
-                        if content:
-                            moran_i = float(content)
-                            entry = {
-                                "Neighborhood Size": n_val,
-                                "Threshold": t_val,
-                                "Seed": s_val,
-                                "Moran's I": moran_i,
-                            }
-                            if h_val is not None:
-                                entry["Always Happy"] = h_val
-                            if g_val is not None:
-                                entry["Grid Size"] = g_val
-                            data.append(entry)
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
+    import pandas as pd
 
     return pd.DataFrame(data)
@@ -1,52 +1,23 @@
 import os
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from scripts import analysis_utils
+
 
 def parse_results(root_dir="results"):
-    data = []
-
-    # Walk through the directory structure
-    for root, dirs, files in os.walk(root_dir):
-        if "moran.csv" in files:
-            # Extract parameters from path
-            # Expected format: .../g_{size}/n_{nh_size}/t_{threshold}/s_{seed}
-            path_parts = root.split(os.sep)
-
-            g_val, n_val, t_val, s_val = None, None, None, None
-
-            for part in path_parts:
-                if part.startswith("g_"):
-                    g_val = int(part.split("_")[1])
-                elif part.startswith("n_"):
-                    n_val = int(part.split("_")[1])
-                elif part.startswith("t_"):
-                    t_val = float(part.split("_")[1])
-                elif part.startswith("s_"):
-                    s_val = int(part.split("_")[1])
-
-            if None not in [g_val, n_val, t_val]:
-                try:
-                    file_path = os.path.join(root, "moran.csv")
-                    with open(file_path, "r") as f:
-                        content = f.read().strip()
-                        if content:
-                            moran_i = float(content)
-                            data.append(
-                                {
-                                    "Grid Size": g_val,
-                                    "Neighborhood Size": n_val,
-                                    "Threshold": t_val,
-                                    "Seed": s_val,
-                                    "Moran's I": moran_i,
-                                }
-                            )
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
-
-    return pd.DataFrame(data)
+    # The shared scandir-based parser walks the tree and reads the moran.csv files
+    # concurrently; only results that carry a grid size (g_*) are kept here
+    df = analysis_utils.parse_results(root_dir)
+    columns = ["Grid Size", "Neighborhood Size", "Threshold", "Seed", "Moran's I"]
+    if "Grid Size" not in df.columns:
+        return pd.DataFrame(columns=columns)
+    df = df.dropna(subset=["Grid Size"]).reset_index(drop=True)
+    df["Grid Size"] = df["Grid Size"].astype(int)
+    return df[columns]
 
 
 def plot_phase_diagram(df, output_dir="output/plots"):
@@ -58,31 +29,34 @@ def plot_phase_diagram(df, output_dir="output/plots"):
     for g in sorted(grid_sizes):
         subset = df[df["Grid Size"] == g]
 
-        # Average over seeds
-        averaged = (
-            subset.groupby(["Neighborhood Size", "Threshold"])["Moran's I"]
-            .mean()
-            .reset_index()
-        )
-
-        # Pivot for heatmap
-        pivot_table = averaged.pivot(
-            index="Neighborhood Size", columns="Threshold", values="Moran's I"
-        )
+        # Average over seeds, then scatter the means straight into a 2D array
+        # (rows: neighbourhood size, columns: threshold) instead of pivoting
+        keys = ["Neighborhood Size", "Threshold"]
+        averaged = subset.groupby(keys)["Moran's I"].mean()
+        n_values = np.sort(subset["Neighborhood Size"].unique())
+        t_values = np.sort(subset["Threshold"].unique())
+        heat = np.full((len(n_values), len(t_values)), np.nan)
+        heat[
+            np.searchsorted(n_values, averaged.index.get_level_values(0)),
+            np.searchsorted(t_values, averaged.index.get_level_values(1)),
+        ] = averaged.to_numpy()
 
         # Sort index (Neighborhood Size) descending for Y-axis (Standard convention: small at bottom? or large at top?)
         # Usually Phase Diagrams have Y going up. So Neighborhood size increasing upwards.
-        pivot_table = pivot_table.sort_index(ascending=False)
+        heat = heat[::-1]
+        n_values = n_values[::-1]
 
         plt.figure(figsize=(12, 8))
         sns.set_context("notebook")
 
         # Create Heatmap
         # annot=True might be too crowded if there are many thresholds. Let's check size.
-        annot = True if pivot_table.shape[1] < 15 else False
+        annot = True if heat.shape[1] < 15 else False
 
         sns.heatmap(
-            pivot_table,
+            heat,
+            xticklabels=t_values.tolist(),
+            yticklabels=n_values.tolist(),
             annot=annot,
             fmt=".2f",
             cmap="viridis",
@@ -4,60 +4,18 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
 
+from scripts import analysis_utils
 
-def parse_results(root_dir="results"):
-    data = []
-
-    # Walk through the directory structure
-    for root, dirs, files in os.walk(root_dir):
-        if "moran.csv" in files:
-            # Expected format: .../h_{always_happy}/n_{nh_size}/t_{threshold}/s_{seed}
-            path_parts = root.split(os.sep)
-
-            h_val, n_val, t_val, s_val = None, None, None, None
 
-            for part in path_parts:
-                if part.startswith("h_"):
-                    try:
-                        h_val = float(part.split("_")[1])
-                    except ValueError:
-                        pass
-                elif part.startswith("n_"):
-                    try:
-                        n_val = int(part.split("_")[1])
-                    except ValueError:
-                        pass
-                elif part.startswith("t_"):
-                    try:
-                        t_val = float(part.split("_")[1])
-                    except ValueError:
-                        pass
-                elif part.startswith("s_"):
-                    try:
-                        s_val = int(part.split("_")[1])
-                    except ValueError:
-                        pass
-
-            if None not in [h_val, n_val, t_val]:
-                try:
-                    file_path = os.path.join(root, "moran.csv")
-                    with open(file_path, "r") as f:
-                        content = f.read().strip()
-                        if content:
-                            moran_i = float(content)
-                            data.append(
-                                {
-                                    "Always Happy": h_val,
-                                    "Neighborhood Size": n_val,
-                                    "Threshold": t_val,
-                                    "Seed": s_val,
-                                    "Moran's I": moran_i,
-                                }
-                            )
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
-
-    return pd.DataFrame(data)
+def parse_results(root_dir="results"):
+    # The shared scandir-based parser walks the tree and reads the moran.csv files
+    # concurrently; only results that carry an always-happy ratio (h_*) are kept here
+    df = analysis_utils.parse_results(root_dir)
+    columns = ["Always Happy", "Neighborhood Size", "Threshold", "Seed", "Moran's I"]
+    if "Always Happy" not in df.columns:
+        return pd.DataFrame(columns=columns)
+    df = df.dropna(subset=["Always Happy"]).reset_index(drop=True)
+    return df[columns]
 
 
 def plot_g_vs_n(df, output_path="output/plots/h_vs_n_moran_gt_0.6.png"):
@@ -1,82 +1,19 @@
-import glob
 import os
 import sys
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-import seaborn as sns
+from matplotlib.lines import Line2D
 
-
-def load_data(log_file):
-    """
-    加载日志数据，支持 MPI 分割日志。
-    """
-    if not os.path.exists(log_file):
-        base_name = log_file.replace(".csv", "_*.csv")
-        files = glob.glob(base_name)
-        if not files:
-            return None
-        df = pd.concat((pd.read_csv(f) for f in files), ignore_index=True)
-    else:
-        df = pd.read_csv(log_file)
-        base_name = log_file.replace(".csv", "_*.csv")
-        files = glob.glob(base_name)
-        if files:
-            split_df = pd.concat((pd.read_csv(f) for f in files), ignore_index=True)
-            if len(split_df) > len(df):
-                df = split_df
-    return df
-
-
-def calculate_morans_i(grid_matrix):
-    """
-    计算网格矩阵的全局莫兰指数。
-    """
-    rows, cols = grid_matrix.shape
-    valid_mask = ~np.isnan(grid_matrix)
-    values = grid_matrix[valid_mask]
-    if len(values) < 2:
-        return np.nan
-    N = len(values)
-    mean_val = np.mean(values)
-    denom = np.sum((values - mean_val) ** 2)
-    if denom == 0:
-        return np.nan
-    num = 0.0
-    W = 0.0
-    neighbors_offsets = [
-        (-1, -1),
-        (-1, 0),
-        (-1, 1),
-        (0, -1),
-        (0, 1),
-        (1, -1),
-        (1, 0),
-        (1, 1),
-    ]
-    for r in range(rows):
-        for c in range(cols):
-            if np.isnan(grid_matrix[r, c]):
-                continue
-            val_i = grid_matrix[r, c]
-            for dr, dc in neighbors_offsets:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < rows and 0 <= nc < cols:
-                    if not np.isnan(grid_matrix[nr, nc]):
-                        val_j = grid_matrix[nr, nc]
-                        num += (val_i - mean_val) * (val_j - mean_val)
-                        W += 1.0
-    if W == 0:
-        return np.nan
-    return (N / W) * (num / denom)
+# 日志加载与莫兰指数使用 analysis_utils 中的共享实现（后者经 Numba 编译）
+from scripts.analysis_utils import calculate_morans_i, load_data
 
 
 def plot_snapshots(log_file, output_dir):
     """
     绘制并保存每个时间步（tick）的网格快照。
     """
-    df = load_data(log_file)
+    df = load_data(log_file, usecols=["tick", "x", "y", "type", "happy"])
     if df is None:
         print(f"错误: 未找到 {log_file}")
         return
@@ -91,62 +28,91 @@ def plot_snapshots(log_file, output_dir):
     width = int(df["x"].max()) + 1
     height = int(df["y"].max()) + 1
 
-    ticks = sorted(df["tick"].unique())
-    print(f"正在为 {len(ticks)} 个 tick 生成快照...")
-
-    for tick in ticks:
-        subset = df[df["tick"] == tick]
-        plt.figure(figsize=(8, 8))
-        sns.scatterplot(
-            data=subset,
-            x="x",
-            y="y",
-            hue="type",
-            palette=["blue", "red"],
-            style="happy",
-            markers={0: "X", 1: "o"},
-            s=60,
-            legend="full",
-        )
-        plt.title(f"Schelling Segregation Model - Tick {tick}")
-        plt.xlim(-1, width)
-        plt.ylim(-1, height)
-        plt.grid(True, linestyle="--", alpha=0.3)
-        plt.legend(bbox_to_anchor=(1.05, 1), loc="upper left")
+    # 一次 groupby 按 tick 切分，代替每个 tick 都对整表做布尔筛选
+    by_tick = df.groupby("tick", sort=True)
+    print(f"正在为 {by_tick.ngroups} 个 tick 生成快照...")
+
+    # 整个循环复用同一张图：坐标范围、网格线与图例只设置一次，
+    # 每个 tick 只移除上一帧的散点并用 NumPy 数组直接调用 ax.scatter（不经过 seaborn）
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ax.set_xlim(-1, width)
+    ax.set_ylim(-1, height)
+    ax.grid(True, linestyle="--", alpha=0.3)
+    type_colors = np.array(["blue", "red"])
+    happy_markers = ((0, "X"), (1, "o"))
+    handles = [
+        Line2D([], [], linestyle="", marker="o", color=color, label=f"type {t}")
+        for t, color in enumerate(type_colors)
+    ] + [
+        Line2D([], [], linestyle="", marker=marker, color="gray", label=f"happy {h}")
+        for h, marker in happy_markers
+    ]
+    ax.legend(handles=handles, bbox_to_anchor=(1.05, 1), loc="upper left")
+
+    for tick, subset in by_tick:
+        for artist in list(ax.collections):
+            artist.remove()
+
+        xs = subset["x"].to_numpy()
+        ys = subset["y"].to_numpy()
+        # 按 0/1 整数下标取颜色（布尔数组会被当作掩码而不是下标）
+        colors = type_colors[(subset["type"].to_numpy() != 0).astype(np.intp)]
+        happy = subset["happy"].to_numpy()
+        for h, marker in happy_markers:
+            sel = happy == h
+            ax.scatter(xs[sel], ys[sel], c=colors[sel], marker=marker, s=60)
+        ax.set_title(f"Schelling Segregation Model - Tick {tick}")
 
         outfile = os.path.join(output_dir, f"tick_{int(tick):03d}.png")
-        plt.savefig(outfile, bbox_inches="tight", dpi=100)
-        plt.close()
+        fig.savefig(outfile, bbox_inches="tight", dpi=100)
+    plt.close(fig)
     print(f"快照已保存至 {output_dir}")
 
 
+def _compute_moran_for_tick(task):
+    """
+    把单个 tick 的 (xs, ys, vals, width, height) 铺回网格（空格为 NaN）并计算全局莫兰指数。
+    """
+    xs, ys, vals, width, height = task
+    grid = np.full((height, width), np.nan)
+    in_bounds = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    grid[ys[in_bounds], xs[in_bounds]] = vals[in_bounds]
+    return calculate_morans_i(grid)
+
+
 def plot_series(log_file, output_file):
     """
     绘制并保存全局莫兰指数随时间变化的曲线图。
     """
-    df = load_data(log_file)
+    df = load_data(log_file, usecols=["tick", "x", "y", "type"])
     if df is None:
         print(f"错误: 未找到 {log_file}")
         return
 
-    ticks = sorted(df["tick"].unique())
-    moran_values = []
+    by_tick = df.groupby("tick", sort=True)
     width = int(df["x"].max()) + 1
     height = int(df["y"].max()) + 1
 
-    print(f"正在计算 {len(ticks)} 个 tick 的莫兰指数序列...")
+    print(f"正在计算 {by_tick.ngroups} 个 tick 的莫兰指数序列...")
 
-    for tick in ticks:
-        tick_df = df[df["tick"] == tick]
-        grid = np.full((height, width), np.nan)
+    # 每个 tick 只取出坐标与取值数组；坐标保持读入时的 int32，直接用于花式索引。
+    # 网格很小、单个 tick 的计算不到一毫秒，逐个 tick 顺序计算即可
+    ticks = []
+    tasks = []
+    for tick, tick_df in by_tick:
         tick_df = tick_df.drop_duplicates(subset=["x", "y"])
-        for _, row in tick_df.iterrows():
-            x, y = int(row["x"]), int(row["y"])
-            val = 1 if row["type"] == 1 else -1
-            if 0 <= x < width and 0 <= y < height:
-                grid[y, x] = val
-        moran_values.append(calculate_morans_i(grid))
+        ticks.append(tick)
+        tasks.append(
+            (
+                tick_df["x"].to_numpy(),
+                tick_df["y"].to_numpy(),
+                np.where(tick_df["type"].to_numpy() == 1, 1.0, -1.0),
+                width,
+                height,
+            )
+        )
 
+    moran_values = [_compute_moran_for_tick(task) for task in tasks]
     plt.figure(figsize=(10, 6))
     plt.plot(ticks, moran_values, marker="o", linestyle="-", color="purple")
     plt.title("Moran's I over Time (Segregation Index)")
@@ -162,8 +128,8 @@ def plot_series(log_file, output_file):
 def main():
     if len(sys.argv) < 4:
         print("用法:")
-        print("  python plot_process.py snapshots <log_file> <output_dir>")
-        print("  python plot_process.py series <log_file> <output_file>")
+        print("  python -m scripts.plot_process snapshots <log_file> <output_dir>")
+        print("  python -m scripts.plot_process series <log_file> <output_file>")
         sys.exit(1)
 
     mode = sys.argv[1]
@@ -4,24 +4,25 @@ import sys
 
 import matplotlib.pyplot as plt
 
+from scripts.analysis_utils import read_float_files
+
+# 路径中的阈值 / 邻域大小，模块加载时编译一次
+THRESHOLD_PATTERN = re.compile(r"t_(\d+\.?\d*)")
+NH_THRESHOLD_PATTERN = re.compile(r"n_(\d+)/t_(\d+\.?\d*)")
+
 
 def plot_single(output_image, input_files):
     """
     绘制单个邻域配置的敏感性分析图（阈值 vs 莫兰指数）。
     """
-    data = []
-    pattern = re.compile(r"t_(\d+\.?\d*)")
-
-    for fpath in input_files:
-        match = pattern.search(fpath)
-        if match:
-            threshold = float(match.group(1))
-            try:
-                with open(fpath, "r") as f:
-                    val = float(f.read().strip())
-                    data.append((threshold, val))
-            except Exception as e:
-                print(f"警告: 无法读取 {fpath}: {e}")
+    # 先从路径中解析阈值，再用线程池并发读取所有单值文件
+    matched = [(m, f) for f in input_files if (m := THRESHOLD_PATTERN.search(f))]
+    values = read_float_files([f for _, f in matched])
+    data = [
+        (float(m.group(1)), val)
+        for (m, _), val in zip(matched, values)
+        if val is not None
+    ]
 
     data.sort(key=lambda x: x[0])
     if not data:
@@ -44,19 +45,11 @@ def plot_combined(output_image, input_files):
     绘制合并的敏感性分析图，在同一张图上比较不同邻域大小的结果。
     """
     data = collections.defaultdict(list)
-    pattern = re.compile(r"n_(\d+)/t_(\d+\.?\d*)")
-
-    for fpath in input_files:
-        match = pattern.search(fpath)
-        if match:
-            n = int(match.group(1))
-            t = float(match.group(2))
-            try:
-                with open(fpath, "r") as f:
-                    val = float(f.read().strip())
-                    data[n].append((t, val))
-            except Exception as e:
-                print(f"警告: 无法读取 {fpath}: {e}")
+    matched = [(m, f) for f in input_files if (m := NH_THRESHOLD_PATTERN.search(f))]
+    values = read_float_files([f for _, f in matched])
+    for (m, _), val in zip(matched, values):
+        if val is not None:
+            data[int(m.group(1))].append((float(m.group(2)), val))
 
     if not data:
         print("未找到有效的数据点。")
@@ -81,8 +74,12 @@ def plot_combined(output_image, input_files):
 def main():
     if len(sys.argv) < 3:
         print("用法:")
-        print("  python plot_sensitivity.py single <output_image> <input_file_1> ...")
-        print("  python plot_sensitivity.py combined <output_image> <input_file_1> ...")
+        print(
+            "  python -m scripts.plot_sensitivity single <output_image> <input_file_1> ..."
+        )
+        print(
+            "  python -m scripts.plot_sensitivity combined <output_image> <input_file_1> ..."
+        )
         sys.exit(1)
 
     mode = sys.argv[1]
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# schelling.py and the analysis scripts import analysis_utils as part of the
+# scripts package; make that package importable from lecture_03 for the tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
@@ -0,0 +1,43 @@
+import pandas as pd
+from scripts import analysis_utils
+
+COLUMNS = ["tick", "agent_id", "rank", "type", "happy", "x", "y"]
+
+
+def _write_log(path, ticks):
+    rows = [(tick, 0, 0, 1, 1, tick, 0) for tick in ticks]
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+
+
+def test_load_data_cache_follows_the_parsed_sources(tmp_path):
+    """The .npz cache is not reused once load_data switches to other files."""
+    log_file = tmp_path / "agent_log.csv"
+    _write_log(log_file, [1])
+    assert analysis_utils.load_data(str(log_file))["tick"].tolist() == [1]
+    # Second call is served from the cache
+    assert (tmp_path / "agent_log.npz").exists()
+    assert analysis_utils.load_data(str(log_file))["tick"].tolist() == [1]
+
+    # Larger shards take over from the main file
+    _write_log(tmp_path / "agent_log_0.csv", [2, 3])
+    _write_log(tmp_path / "agent_log_1.csv", [4, 5])
+    df = analysis_utils.load_data(str(log_file))
+    assert sorted(df["tick"].tolist()) == [2, 3, 4, 5]
+
+    # Dropping a shard hands the choice back to the main file
+    (tmp_path / "agent_log_1.csv").unlink()
+    (tmp_path / "agent_log_0.csv").write_text("tick\n")
+    assert analysis_utils.load_data(str(log_file))["tick"].tolist() == [1]
+
+
+def test_load_data_reparses_a_truncated_cache(tmp_path):
+    """A damaged .npz cache falls back to the CSV and is rewritten."""
+    log_file = tmp_path / "agent_log.csv"
+    _write_log(log_file, [1, 2])
+    analysis_utils.load_data(str(log_file))
+    cache_file = tmp_path / "agent_log.npz"
+    cache_file.write_bytes(cache_file.read_bytes()[:40])
+
+    assert analysis_utils.load_data(str(log_file))["tick"].tolist() == [1, 2]
+    assert analysis_utils.load_data(str(log_file))["tick"].tolist() == [1, 2]
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
@@ -0,0 +1,27 @@
+import matplotlib
+import pandas as pd
+
+matplotlib.use("Agg")
+
+from scripts import plot_process  # noqa: E402
+
+
+def test_plot_snapshots_colors_every_agent(tmp_path):
+    """Each tick holds more agents than there are type colours."""
+    rows = [
+        (tick, agent_id, 0, agent_id % 2, happy, agent_id, (agent_id + tick) % 4)
+        for tick in (1, 2)
+        for agent_id, happy in zip(range(5), (1, 0, 1, 1, 0))
+    ]
+    log_file = tmp_path / "agent_log.csv"
+    pd.DataFrame(
+        rows, columns=["tick", "agent_id", "rank", "type", "happy", "x", "y"]
+    ).to_csv(log_file, index=False)
+
+    out_dir = tmp_path / "snapshots"
+    plot_process.plot_snapshots(str(log_file), str(out_dir))
+
+    assert sorted(p.name for p in out_dir.iterdir()) == [
+        "tick_001.png",
+        "tick_002.png",
+    ]